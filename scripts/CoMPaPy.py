@@ -1,9 +1,13 @@
 import actionlib
+from concurrent.futures import ThreadPoolExecutor, as_completed
 from datetime import datetime
+import math
 import numpy as np
 from pathlib import Path
+import pickle
 import rospy
 from scipy.spatial.transform import Rotation
+import threading
 import time
 from typing import Dict, Optional, Tuple, List, Union
 
@@ -11,12 +15,14 @@ import franka_gripper.msg
 import geometry_msgs
 from geometry_msgs.msg import Pose
 import moveit_msgs.msg
-from moveit_msgs.msg import RobotTrajectory
+from moveit_msgs.msg import MoveItErrorCodes, RobotTrajectory
+from moveit_msgs.srv import GetCartesianPath, GetCartesianPathRequest
 from sensor_msgs.msg import JointState
 
 from moveit_tutorials.doc.move_group_python_interface.scripts.move_group_python_interface_tutorial import \
     MoveGroupPythonInterfaceTutorial
 
+from compapy.scripts.socket_interface.frame_conversion import quaternion_angle_rad, trial_offset
 from compapy.scripts.utils import setup_logger, read_yaml, json_load, pose_to_list, PlanningRes, wrap_to_pi
 
 
@@ -36,13 +42,71 @@ class CoMPaPy(MoveGroupPythonInterfaceTutorial):
             saving_dir = log_file.parent
 
         self.planning_res_dir = None
+        self._io_pool = None
         if save_planning_res:
             self.planning_res_dir = saving_dir / 'planning_res'
             self.planning_res_dir.mkdir(parents=True, exist_ok=True)
+            # planning results are written in the background, out of the `move_l` critical path
+            self._io_pool = ThreadPoolExecutor(max_workers=1)
 
         self.logger = setup_logger(self.__class__.__name__, log_file=log_file)
 
         self.config = read_yaml(Path('config/compapy.yaml'))
+        self._unpack_config()
+
+        # the `compute_cartesian_path` service can be called directly only if its request can limit the cartesian
+        #   speed, as `move_group.compute_cartesian_path()` does
+        self._use_cartesian_path_service = all(
+            field in GetCartesianPathRequest.__slots__
+            for field in ['max_cartesian_speed', 'cartesian_speed_end_effector_link']
+        )
+        # one `compute_cartesian_path` service proxy per thread (cf. `_cartesian_path_service()`)
+        self._thread_local = threading.local()
+        # older `moveit_msgs` always time-parameterize the path computed by `compute_cartesian_path`
+        self._can_skip_time_parameterization = self._use_cartesian_path_service and (
+                'generate_trajectory' in GetCartesianPathRequest.__slots__
+        )
+
+        # the trials of `move_l` are run concurrently only if requested
+        #   only the service calls run in `_plan_pool`: `move_group` and `robot` are not thread-safe
+        self._plan_pool = None
+        n_parallel_trials = self.config['move_l']['n_parallel_trials']
+        if n_parallel_trials > 1:
+            if self._use_cartesian_path_service:
+                self._plan_pool = ThreadPoolExecutor(max_workers=n_parallel_trials)
+                self.logger.info(f'[{n_parallel_trials}] move_l trials planned in parallel, '
+                                 f'time-parameterization skipped: [{self._can_skip_time_parameterization}]')
+            else:
+                self.logger.warning(f'n_parallel_trials = [{n_parallel_trials}] ignored: the compute_cartesian_path '
+                                    f'service cannot be called directly, the trials are planned one after the other')
+
+        # complete `move_l` plans, keyed by (speed, start joints, target pose), persisted across runs by `shutdown()`
+        self._plan_cache = {}
+        self._plan_cache_path = None
+        self._plan_cache_max_size = self.config['move_l']['cache_max_size']
+        self._plan_cache_modified = False
+        self._plan_cache_lock = threading.Lock()
+        if self.config['move_l']['use_cache']:
+            self._plan_cache_path = Path(self.config['move_l']['cache_path'])
+            if self._plan_cache_path.exists():
+                with self._plan_cache_path.open('rb') as f:
+                    self._plan_cache = pickle.load(f)
+                self.logger.info(f'loaded [{len(self._plan_cache)}] cached plans from [{self._plan_cache_path}]')
+
+        # also called on ctrl-c / node shutdown, e.g. if the caller script does not call it
+        rospy.on_shutdown(self.shutdown)
+
+        # latest `/franka_gripper/joint_states` message, read by `get_gripper_width_mm`
+        self._gripper_joint_state = None
+        self._gripper_sub = rospy.Subscriber(
+            '/franka_gripper/joint_states',
+            JointState,
+            self._on_gripper_joint_state,
+            queue_size=1
+        )
+
+        # gripper action clients, connected on first use (e.g. not needed when ignoring the gripper)
+        self._gripper_clients = {}
 
         obstacles_file = Path(self.config['obstacles']['config_path'])
         if not obstacles_file.exists():
@@ -54,6 +118,53 @@ class CoMPaPy(MoveGroupPythonInterfaceTutorial):
 
         self._log_joints()
 
+    def _unpack_config(self) -> None:
+        """
+        cache the config values read on every `move_l` / gripper call
+        to be called again after modifying `self.config`
+        """
+        move_l_config = self.config['move_l']
+        self._move_l_speed = move_l_config['speed']
+        self._move_l_resolution_m = move_l_config['resolution_m']
+        self._move_l_min_resolution_m_offset = move_l_config['min_resolution_m_offset']
+        self._move_l_max_resolution_m_offset = move_l_config['max_resolution_m_offset']
+        self._move_l_jump_threshold = move_l_config['jump_threshold']
+        self._move_l_min_jump_threshold_offset = move_l_config['min_jump_threshold_offset']
+        self._move_l_max_jump_threshold_offset = move_l_config['max_jump_threshold_offset']
+        self._move_l_skip_trivial = move_l_config['skip_trivial']
+        self._move_l_trivial_max_distance_m = move_l_config['trivial_max_distance_m']
+        self._move_l_trivial_max_angle_rad = np.deg2rad(move_l_config['trivial_max_angle_deg'])
+
+        self._open_gripper_width = self.config['open_gripper']['width']
+        self._open_gripper_speed = self.config['open_gripper']['speed']
+
+        close_gripper_config = self.config['close_gripper']
+        self._close_gripper_width = close_gripper_config['width']
+        self._close_gripper_epsilon_inner = close_gripper_config['epsilon_inner']
+        self._close_gripper_epsilon_outer = close_gripper_config['epsilon_outer']
+        self._close_gripper_speed = close_gripper_config['speed']
+        self._close_gripper_force = close_gripper_config['force']
+
+        self._publish_display_trajectory = self.config['show_plan']['publish_display_trajectory']
+
+    def shutdown(self) -> None:
+        """
+        wait for the pending background work (e.g. saving planning results), stop the worker threads
+        and write the plan cache
+        can be called several times: the cache is only written if modified since the last call
+        """
+        for pool in [self._io_pool, self._plan_pool]:
+            if pool is not None:
+                pool.shutdown(wait=True)
+
+        with self._plan_cache_lock:
+            if self._plan_cache_modified:
+                self._plan_cache_path.parent.mkdir(parents=True, exist_ok=True)
+                with self._plan_cache_path.open('wb') as f:
+                    pickle.dump(dict(self._plan_cache), f)
+                self._plan_cache_modified = False
+                self.logger.info(f'saved [{len(self._plan_cache)}] cached plans to [{self._plan_cache_path}]')
+
     def exe_plan(
             self,
             plan: RobotTrajectory
@@ -96,34 +207,23 @@ class CoMPaPy(MoveGroupPythonInterfaceTutorial):
     ) -> Tuple[bool, str]:
         assert n_trials > 0, 'n_trials must be > 0'
 
-        resolution_m_offset = 0
-        jump_threshold_offset = 0
-        plan_success = plan = fraction = None
+        if self._move_l_skip_trivial and self._is_trivial_move(target_pose=target_pose):
+            return True, ''
 
-        for i_trial in range(n_trials):
-            if i_trial > 0:
-                resolution_m_offset = np.random.uniform(
-                    self.config['move_l']['min_resolution_m_offset'],
-                    self.config['move_l']['max_resolution_m_offset']
-                )
-                jump_threshold_offset = np.random.uniform(
-                    self.config['move_l']['min_jump_threshold_offset'],
-                    self.config['move_l']['max_jump_threshold_offset']
-                )
+        cache_key = None
+        cached_plan = None
+        if self._plan_cache_path is not None:
+            cache_key = self._plan_cache_key(target_pose=target_pose)
+            cached_plan = self._plan_cache.get(cache_key)
 
-            plan_success, plan, fraction = self.plan_l(
-                target_pose=target_pose,
-                resolution_m=self.config['move_l']['resolution_m'] + resolution_m_offset,
-                jump_threshold=self.config['move_l']['jump_threshold'] + jump_threshold_offset
-            )
-            if plan_success:
-                if i_trial > 0:
-                    self.logger.info(f'trial [{i_trial}]/[{n_trials - 1}] retrying with other params helped!')
-                break
-            self.logger.warning(f'trial [{i_trial}]/[{n_trials - 1}] failed: fraction=[{fraction:.1%}]')
-            # # todo: run the not-complete planned path to check, at the end of the plan, which joint reaches the limit:
-            # exe_success = self.exe_plan(plan)
-            # self.logger.warning(f'trial [{i_trial}]/[{n_trials - 1}] execution: success={exe_success}')
+        if cached_plan is not None:
+            self.logger.info(f'reusing cached plan ([{len(cached_plan.joint_trajectory.points)}] points)')
+            self._show_plan(cached_plan)
+            plan_success, plan, fraction = True, cached_plan, 1.0
+        else:
+            plan_success, plan, fraction = self._plan_move_l(target_pose=target_pose, n_trials=n_trials)
+            if plan_success and (cache_key is not None):
+                self._cache_plan(cache_key=cache_key, plan=plan)
 
         self._save_plan(target_pose=target_pose, plan=plan)
 
@@ -157,13 +257,18 @@ class CoMPaPy(MoveGroupPythonInterfaceTutorial):
             target_pose: Pose,
             resolution_m: Optional[float] = None,
             jump_threshold: Optional[float] = None,
+            time_parameterize: bool = True,
     ) -> Tuple[bool, RobotTrajectory, float]:
+        """
+        `time_parameterize=False` lets MoveIt skip the time-parameterization of the path (if supported),
+        e.g. while trying several params where only `fraction` matters. Such a plan cannot be executed
+        """
 
         if jump_threshold is None:
-            jump_threshold = self.config['move_l']['jump_threshold']
+            jump_threshold = self._move_l_jump_threshold
 
         if resolution_m is None:
-            resolution_m = self.config['move_l']['resolution_m']
+            resolution_m = self._move_l_resolution_m
 
         # do not add current point to the waypoint list
         #   otherwise: "Trajectory message contains waypoints that are not strictly increasing in time."
@@ -172,14 +277,8 @@ class CoMPaPy(MoveGroupPythonInterfaceTutorial):
             target_pose,
         ]
 
-        # todo: add constraints
-        #  https://github.com/ros-planning/moveit_tutorials/pull/518/files#diff-77946a0e5e0e873f97288add4d30861477c31fa4528736e414a0903fbaa9c438
-        self.move_group.limit_max_cartesian_link_speed(
-            speed=self.config['move_l']['speed']
-        )
-
         # takes as input waypoints of end effector poses, and outputs a joint trajectory that visits each pose
-        plan, fraction = self.move_group.compute_cartesian_path(
+        plan, fraction = self._compute_cartesian_path(
             waypoints=waypoints,
 
             # configurations are computed for every eef_step meters
@@ -203,7 +302,19 @@ class CoMPaPy(MoveGroupPythonInterfaceTutorial):
 
             # todo: add path_constraints?
             # todo: how to check the current joint-bounds written in `joint_limits.yaml`?
+
+            time_parameterize=time_parameterize
         )
+        self._log_plan_l(plan=plan, fraction=fraction, resolution_m=resolution_m)
+
+        return fraction == 1.0, plan, fraction
+
+    def _log_plan_l(
+            self,
+            plan: RobotTrajectory,
+            fraction: float,
+            resolution_m: float
+    ) -> None:
         self._show_plan(plan)
 
         if fraction == -1.0:
@@ -217,7 +328,266 @@ class CoMPaPy(MoveGroupPythonInterfaceTutorial):
                 self.logger.error(f'path not complete [{fraction:.1%}]')
                 self._log_joints()  # todo: pass last Pose of the plan
 
-        return fraction == 1.0, plan, fraction
+    def _cartesian_path_service(self) -> rospy.ServiceProxy:
+        """
+        proxy of the `compute_cartesian_path` service owned by the calling thread
+        the trials of `move_l` may call the service concurrently from `_plan_pool`
+        """
+        service = getattr(self._thread_local, 'cartesian_path_service', None)
+        if service is None:
+            service = rospy.ServiceProxy('compute_cartesian_path', GetCartesianPath)
+            self._thread_local.cartesian_path_service = service
+        return service
+
+    def _compute_cartesian_path(
+            self,
+            waypoints: List[Pose],
+            eef_step: float,
+            jump_threshold: float,
+            time_parameterize: bool
+    ) -> Tuple[RobotTrajectory, float]:
+        """
+        same as `move_group.compute_cartesian_path()`, but calling the MoveIt service directly (if supported)
+        to optionally disable the time-parameterization
+        """
+        if not self._use_cartesian_path_service:
+            # todo: add constraints
+            #  https://github.com/ros-planning/moveit_tutorials/pull/518/files#diff-77946a0e5e0e873f97288add4d30861477c31fa4528736e414a0903fbaa9c438
+            self.move_group.limit_max_cartesian_link_speed(
+                speed=self._move_l_speed
+            )
+            return self.move_group.compute_cartesian_path(
+                waypoints=waypoints,
+                eef_step=eef_step,
+                jump_threshold=jump_threshold
+            )
+
+        request = self._cartesian_path_request(
+            waypoints=waypoints,
+            eef_step=eef_step,
+            jump_threshold=jump_threshold,
+            time_parameterize=time_parameterize
+        )
+        return self._call_cartesian_path_service(request)
+
+    def _cartesian_path_request(
+            self,
+            waypoints: List[Pose],
+            eef_step: float,
+            jump_threshold: float,
+            time_parameterize: bool
+    ) -> GetCartesianPathRequest:
+        """
+        same request as `move_group.compute_cartesian_path()` after `limit_max_cartesian_link_speed()`
+        reads `move_group`: to be called from the thread owning it, not from `_plan_pool`
+        """
+        request = GetCartesianPathRequest()
+        request.header.frame_id = self.move_group.get_pose_reference_frame()
+        request.header.stamp = rospy.Time.now()
+        request.start_state.is_diff = True  # start from the current state
+        request.group_name = self.move_group.get_name()
+        request.link_name = self.move_group.get_end_effector_link()
+        request.waypoints = waypoints
+        request.max_step = eef_step
+        request.jump_threshold = jump_threshold
+        request.avoid_collisions = True
+        if self._can_skip_time_parameterization:
+            request.generate_trajectory = time_parameterize
+        request.max_cartesian_speed = self._move_l_speed
+        request.cartesian_speed_end_effector_link = request.link_name
+        return request
+
+    def _call_cartesian_path_service(
+            self,
+            request: GetCartesianPathRequest
+    ) -> Tuple[RobotTrajectory, float]:
+        """
+        can be called from `_plan_pool`: only uses the service proxy of the calling thread
+        """
+        try:
+            response = self._cartesian_path_service()(request)
+        except rospy.ServiceException as e:
+            self.logger.error(f'compute_cartesian_path service: {e}')
+            return RobotTrajectory(), -1.0
+
+        if response.error_code.val != MoveItErrorCodes.SUCCESS:
+            return response.solution, -1.0
+        return response.solution, response.fraction
+
+    def _is_trivial_move(
+            self,
+            target_pose: Pose
+    ) -> bool:
+        """
+        whether the current pose is already within `trivial_max_distance_m` and `trivial_max_angle_deg` of the target
+        """
+        start_pose = self.get_pose()
+        distance = self._compute_distance(target_pose=target_pose, start_pose=start_pose)
+        angle_rad = quaternion_angle_rad(pose_to_list(target_pose)[3:], pose_to_list(start_pose)[3:])
+        if (distance < self._move_l_trivial_max_distance_m) and (angle_rad < self._move_l_trivial_max_angle_rad):
+            self.logger.info(f'target already reached ([{distance * 1000:.1f}] mm, '
+                             f'[{np.rad2deg(angle_rad):.2f}] deg): skip planning and execution')
+            return True
+        return False
+
+    def _plan_cache_key(
+            self,
+            target_pose: Pose
+    ) -> Tuple[float, ...]:
+        """
+        the plan is a joint trajectory: key on the start joints rather than on the start pose (redundant arm)
+        joints are rounded to 1e-3 rad, target positions to 1 mm and target quaternions to 1e-3
+        the cartesian speed limit is part of the key: it changes the time-parameterization of the plan
+        """
+        start_joints = [round(j, 3) for j in self.get_joints()]
+        target = [round(e, 3) for e in pose_to_list(target_pose)]
+        return tuple([self._move_l_speed] + start_joints + target)
+
+    def _cache_plan(
+            self,
+            cache_key: Tuple[float, ...],
+            plan: RobotTrajectory
+    ) -> None:
+        """
+        beyond `cache_max_size` plans, the oldest ones are evicted
+        """
+        self._plan_cache[cache_key] = plan
+        while len(self._plan_cache) > self._plan_cache_max_size:
+            del self._plan_cache[next(iter(self._plan_cache))]
+        self._plan_cache_modified = True
+
+    def _plan_l_params(
+            self,
+            i_trial: int
+    ) -> Tuple[float, float]:
+        """
+        (resolution_m, jump_threshold) used by the `i_trial`-th trial of `move_l`
+        the first trial uses the config values, the next ones are offset from them (see `trial_offset()`)
+        """
+        resolution_m_offset = trial_offset(
+            i_trial,
+            min_offset=self._move_l_min_resolution_m_offset,
+            max_offset=self._move_l_max_resolution_m_offset,
+            base=2
+        )
+        jump_threshold_offset = trial_offset(
+            i_trial,
+            min_offset=self._move_l_min_jump_threshold_offset,
+            max_offset=self._move_l_max_jump_threshold_offset,
+            base=3
+        )
+        return (
+            self._move_l_resolution_m + resolution_m_offset,
+            self._move_l_jump_threshold + jump_threshold_offset
+        )
+
+    def _plan_move_l(
+            self,
+            target_pose: Pose,
+            n_trials: int
+    ) -> Tuple[bool, RobotTrajectory, float]:
+        """
+        the retries (and the parallel trials) skip the time-parameterization: the first complete one is planned
+        again with it, so that the cartesian speed limit applies to the executed plan
+        """
+        trial_params = [self._plan_l_params(i_trial=i_trial) for i_trial in range(n_trials)]
+        if (self._plan_pool is None) or (n_trials == 1):
+            plan_success, plan, fraction, i_trial = self._plan_l_serially(
+                target_pose=target_pose,
+                trial_params=trial_params
+            )
+        else:
+            plan_success, plan, fraction, i_trial = self._plan_l_in_parallel(
+                target_pose=target_pose,
+                trial_params=trial_params
+            )
+
+        if plan_success and not self._is_time_parameterized(plan):
+            resolution_m, jump_threshold = trial_params[i_trial]
+            plan_success, plan, fraction = self.plan_l(
+                target_pose=target_pose,
+                resolution_m=resolution_m,
+                jump_threshold=jump_threshold,
+                time_parameterize=True
+            )
+        return plan_success, plan, fraction
+
+    @staticmethod
+    def _is_time_parameterized(plan: RobotTrajectory) -> bool:
+        points = plan.joint_trajectory.points
+        return (len(points) < 2) or (points[-1].time_from_start.to_sec() > 0)
+
+    def _plan_l_serially(
+            self,
+            target_pose: Pose,
+            trial_params: List[Tuple[float, float]]
+    ) -> Tuple[bool, RobotTrajectory, float, int]:
+        """
+        returns the result of the first complete trial (or of the last one) and its index
+        """
+        n_trials = len(trial_params)
+        plan_success = plan = fraction = i_trial = None
+        for i_trial, (resolution_m, jump_threshold) in enumerate(trial_params):
+            plan_success, plan, fraction = self.plan_l(
+                target_pose=target_pose,
+                resolution_m=resolution_m,
+                jump_threshold=jump_threshold,
+                # the first trial usually succeeds: time-parameterize it right away, not the retries
+                time_parameterize=(i_trial == 0)
+            )
+            if plan_success:
+                if i_trial > 0:
+                    self.logger.info(f'trial [{i_trial}]/[{n_trials - 1}] retrying with other params helped!')
+                break
+            self.logger.warning(f'trial [{i_trial}]/[{n_trials - 1}] failed: fraction=[{fraction:.1%}]')
+            # # todo: run the not-complete planned path to check, at the end of the plan, which joint reaches the limit:
+            # exe_success = self.exe_plan(plan)
+            # self.logger.warning(f'trial [{i_trial}]/[{n_trials - 1}] execution: success={exe_success}')
+
+        return plan_success, plan, fraction, i_trial
+
+    def _plan_l_in_parallel(
+            self,
+            target_pose: Pose,
+            trial_params: List[Tuple[float, float]]
+    ) -> Tuple[bool, RobotTrajectory, float, int]:
+        """
+        submit all trials to `_plan_pool` and keep the first complete plan (returned with the index of its trial)
+        pending trials are cancelled. The running ones cannot be interrupted (ROS1 services): their results are
+        discarded
+        the requests are built, and the results logged, in the calling thread: the workers only call the service
+        """
+        n_trials = len(trial_params)
+        future_to_trial = {
+            self._plan_pool.submit(
+                self._call_cartesian_path_service,
+                self._cartesian_path_request(
+                    waypoints=[target_pose],
+                    eef_step=resolution_m,
+                    jump_threshold=jump_threshold,
+                    time_parameterize=False
+                )
+            ): i_trial
+            for i_trial, (resolution_m, jump_threshold) in enumerate(trial_params)
+        }
+
+        plan_success = plan = fraction = i_trial = None
+        try:
+            for future in as_completed(future_to_trial):
+                i_trial = future_to_trial[future]
+                plan, fraction = future.result()
+                self._log_plan_l(plan=plan, fraction=fraction, resolution_m=trial_params[i_trial][0])
+                plan_success = fraction == 1.0
+                if plan_success:
+                    if i_trial > 0:
+                        self.logger.info(f'trial [{i_trial}]/[{n_trials - 1}] retrying with other params helped!')
+                    break
+                self.logger.warning(f'trial [{i_trial}]/[{n_trials - 1}] failed: fraction=[{fraction:.1%}]')
+        finally:
+            for future in future_to_trial:
+                future.cancel()
+
+        return plan_success, plan, fraction, i_trial
 
     def rotate_joint(
             self,
@@ -261,12 +631,11 @@ class CoMPaPy(MoveGroupPythonInterfaceTutorial):
 
     def open_gripper(self) -> bool:
         try:
-            move_client = actionlib.SimpleActionClient('/franka_gripper/move', franka_gripper.msg.MoveAction)
-            move_client.wait_for_server()
+            move_client = self._gripper_client(action_name='move', action_spec=franka_gripper.msg.MoveAction)
 
             goal = franka_gripper.msg.MoveGoal()
-            goal.width = self.config['open_gripper']['width']
-            goal.speed = self.config['open_gripper']['speed']
+            goal.width = self._open_gripper_width
+            goal.speed = self._open_gripper_speed
 
             move_client.send_goal(goal)
 
@@ -281,21 +650,20 @@ class CoMPaPy(MoveGroupPythonInterfaceTutorial):
 
     def close_gripper(self) -> bool:
         try:
-            width_max_m = self.config['close_gripper']['width'] + self.config['close_gripper']['epsilon_outer']
+            width_max_m = self._close_gripper_width + self._close_gripper_epsilon_outer
             width_mm, err_msg = self.get_gripper_width_mm()
             if (width_mm is not None) and (width_mm < width_max_m * 1000):
                 self.logger.warning('trying to close while already closed')
                 return True
 
-            grasp_client = actionlib.SimpleActionClient('/franka_gripper/grasp', franka_gripper.msg.GraspAction)
-            grasp_client.wait_for_server()
+            grasp_client = self._gripper_client(action_name='grasp', action_spec=franka_gripper.msg.GraspAction)
 
             goal = franka_gripper.msg.GraspGoal()
-            goal.width = self.config['close_gripper']['width']
-            goal.epsilon.inner = self.config['close_gripper']['epsilon_inner']
-            goal.epsilon.outer = self.config['close_gripper']['epsilon_outer']
-            goal.speed = self.config['close_gripper']['speed']
-            goal.force = self.config['close_gripper']['force']
+            goal.width = self._close_gripper_width
+            goal.epsilon.inner = self._close_gripper_epsilon_inner
+            goal.epsilon.outer = self._close_gripper_epsilon_outer
+            goal.speed = self._close_gripper_speed
+            goal.force = self._close_gripper_force
 
             grasp_client.send_goal(goal)
 
@@ -341,7 +709,10 @@ class CoMPaPy(MoveGroupPythonInterfaceTutorial):
         error_msg = ''
 
         try:
-            msg = rospy.wait_for_message('/franka_gripper/joint_states', JointState, timeout=5)
+            msg = self._gripper_joint_state
+            if msg is None:
+                # nothing received yet by the persistent subscriber
+                msg = rospy.wait_for_message('/franka_gripper/joint_states', JointState, timeout=5)
 
             if msg.name != ['panda_finger_joint1', 'panda_finger_joint2']:
                 self.logger.error(f'[gripper] msg.name = {msg.name}')
@@ -361,6 +732,32 @@ class CoMPaPy(MoveGroupPythonInterfaceTutorial):
 
         return width_mm, error_msg
 
+    def _gripper_client(
+            self,
+            action_name: str,
+            action_spec
+    ) -> actionlib.SimpleActionClient:
+        """
+        persistent client of the `/franka_gripper/<action_name>` action server
+        re-created if the connection to the server got lost (e.g. the gripper node was restarted)
+        """
+        client = self._gripper_clients.get(action_name)
+        if client is not None:
+            if client.wait_for_server(timeout=rospy.Duration(1.0)):
+                return client
+            self.logger.warning(f'[gripper] lost [{action_name}] action server: reconnecting')
+
+        client = actionlib.SimpleActionClient(f'/franka_gripper/{action_name}', action_spec)
+        client.wait_for_server()
+        self._gripper_clients[action_name] = client
+        return client
+
+    def _on_gripper_joint_state(
+            self,
+            msg: JointState
+    ) -> None:
+        self._gripper_joint_state = msg
+
     def _add_scene_element(
             self,
             element: Dict
@@ -392,33 +789,26 @@ class CoMPaPy(MoveGroupPythonInterfaceTutorial):
     ) -> None:
         current_p = self.get_pose()
 
-        target_pose_position = np.array([target_pose.position.x, target_pose.position.y, target_pose.position.z])
-        l8_pose_position = np.array([current_p.position.x, current_p.position.y, current_p.position.z])
-        delta_cm = 100 * np.linalg.norm((target_pose_position - l8_pose_position))
+        dx = target_pose.position.x - current_p.position.x
+        dy = target_pose.position.y - current_p.position.y
+        dz = target_pose.position.z - current_p.position.z
+        delta_cm = 100 * math.sqrt(dx * dx + dy * dy + dz * dz)
         self.logger.info(f'after [{move_name}]: delta = [{delta_cm:0.2f} cm]')
 
-        target_q = np.array([
-            target_pose.orientation.x,
-            target_pose.orientation.y,
-            target_pose.orientation.z,
-            target_pose.orientation.w,
-        ])
-        l8_q = np.array([
-            current_p.orientation.x,
-            current_p.orientation.y,
-            current_p.orientation.z,
-            current_p.orientation.w,
-        ])
-        target_euler_rad = Rotation.from_quat(target_q).as_euler('xyz')
-        l8_euler_rad = Rotation.from_quat(l8_q).as_euler('xyz')
-        delta_euler_rad = np.linalg.norm((wrap_to_pi(l8_euler_rad - target_euler_rad)))
-        self.logger.info(f'after [{move_name}]: delta_euler_deg = [{np.rad2deg(delta_euler_rad):0.1f}]')
+        # geodesic distance between the two orientations (euler angles are not suited for comparisons)
+        #   still logged as `delta_euler_deg` for the tools parsing the logs
+        delta_angle_rad = quaternion_angle_rad(pose_to_list(target_pose)[3:], pose_to_list(current_p)[3:])
+        self.logger.info(f'after [{move_name}]: delta_euler_deg = [{np.rad2deg(delta_angle_rad):0.1f}]')
 
         if delta_cm > 1.0:
             self.logger.error(f'after [{move_name}]: delta_cm = [{delta_cm:.2f} cm] between target and current pose')
 
-        if delta_euler_rad > np.deg2rad(1.0):
-            self.logger.error(f'after [{move_name}]: delta_euler_deg = [{np.rad2deg(delta_euler_rad):.1f}] '
+        if delta_angle_rad > np.deg2rad(1.0):
+            target_o = target_pose.orientation
+            l8_o = current_p.orientation
+            target_euler_rad = Rotation.from_quat([target_o.x, target_o.y, target_o.z, target_o.w]).as_euler('xyz')
+            l8_euler_rad = Rotation.from_quat([l8_o.x, l8_o.y, l8_o.z, l8_o.w]).as_euler('xyz')
+            self.logger.error(f'after [{move_name}]: delta_euler_deg = [{np.rad2deg(delta_angle_rad):.1f}] '
                               f'between target ({np.rad2deg(target_euler_rad)}) '
                               f'and current pose ({np.rad2deg(l8_euler_rad)})')
 
@@ -465,12 +855,26 @@ class CoMPaPy(MoveGroupPythonInterfaceTutorial):
         timestamp = curr_time.strftime('%Y%m%d_%H%M%S_%f')
         distance = self._compute_distance(target_pose=target_pose, start_pose=start_pose)
         file_name = f'{timestamp}_cm[{int(distance * 100)}]_f[{fraction_str}].json'
-        planning_res.save(saving_path=self.planning_res_dir / file_name)
+        self._io_pool.submit(self._write_planning_res, planning_res, self.planning_res_dir / file_name)
+
+    def _write_planning_res(
+            self,
+            planning_res: PlanningRes,
+            saving_path: Path
+    ) -> None:
+        # run in `_io_pool`: exceptions would otherwise be silently stored in the future
+        try:
+            planning_res.save(saving_path=saving_path)
+        except Exception as e:
+            self.logger.error(f'failed to save [{saving_path}]: {e}')
 
     def _show_plan(
             self,
             plan: RobotTrajectory
     ) -> None:
+        if not self._publish_display_trajectory:
+            return
+
         display_trajectory = moveit_msgs.msg.DisplayTrajectory()
         display_trajectory.trajectory_start = self.robot.get_current_state()
         display_trajectory.trajectory.append(plan)
@@ -485,11 +889,10 @@ class CoMPaPy(MoveGroupPythonInterfaceTutorial):
         if start_pose is None:
             start_pose = self.move_group.get_current_pose().pose
 
-        distance = np.linalg.norm([
-            target_pose.position.x - start_pose.position.x,
-            target_pose.position.y - start_pose.position.y,
-            target_pose.position.z - start_pose.position.z,
-        ])
+        dx = target_pose.position.x - start_pose.position.x
+        dy = target_pose.position.y - start_pose.position.y
+        dz = target_pose.position.z - start_pose.position.z
+        distance = math.sqrt(dx * dx + dy * dy + dz * dz)
         if log:
             self.logger.info(f'want to travel [{distance * 100:.1f} cm]')
             # self.logger.info(f'... with resolution_m=[{resolution_m:.5f}] and jump_threshold=[{jump_threshold:.3f}]')
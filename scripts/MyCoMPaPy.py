@@ -5,13 +5,14 @@ a specialization for a particular setting
     - the gripper only rotates along z
 
 """
+import math
 import numpy as np
 from pathlib import Path
-from scipy.spatial.transform import Rotation
 from typing import Optional, Tuple
 
 import geometry_msgs
-from compapy.scripts.socket_interface.frame_conversion import link8_in_base
+from compapy.scripts.socket_interface.frame_conversion import link8_in_base, euler_xyz_from_quat, quat_from_rz, \
+    quat_from_rz_batch
 from compapy.scripts.socket_interface.pose_conversion import pose_from_xyz_and_rotvec
 from compapy.scripts.utils import wrap_to_pi, wrap_to_pi_over_four
 from geometry_msgs.msg import Point, Pose, Quaternion
@@ -99,11 +100,18 @@ class MyCoMPaPy(CoMPaPy):
         """
         expect orientation [180°, 0, rz] (euler) and derive rz
         """
-        r = Rotation.from_quat([q.x, q.y, q.z, q.w])
-        euler_rad = r.as_euler('xyz')
-
         euler_ref = [np.pi, 0, 0]
         threshold = np.deg2rad(3)
+
+        # fail fast: r22 = cos(roll) * cos(pitch) must be close to -1 for roll close to 180° and pitch close to 0
+        r22 = 1.0 - 2.0 * (q.x * q.x + q.y * q.y) / (q.x * q.x + q.y * q.y + q.z * q.z + q.w * q.w)
+        if r22 > -math.cos(threshold) ** 2:
+            tilt_deg = np.rad2deg(math.acos(max(-1.0, min(1.0, -r22))))
+            self.logger.error(f'cannot derive rz: z-axis tilted by [{tilt_deg:.1f}] deg from the downward direction')
+            return None
+
+        euler_rad = euler_xyz_from_quat(x=q.x, y=q.y, z=q.z, w=q.w)
+
         if abs(wrap_to_pi(euler_rad[0] - euler_ref[0])) < threshold:
             if abs(wrap_to_pi(euler_rad[1] - euler_ref[1])) < threshold:
                 rz = euler_rad[2]
@@ -113,9 +121,15 @@ class MyCoMPaPy(CoMPaPy):
 
     @staticmethod
     def q_from_rz(rz_rad: float) -> Quaternion:
-        euler_rad = [np.pi, 0, rz_rad]
-        q = Rotation.from_euler(angles=euler_rad, seq='xyz').as_quat()
-        return Quaternion(x=q[0], y=q[1], z=q[2], w=q[3])
+        x, y, z, w = quat_from_rz(rz_rad=rz_rad)
+        return Quaternion(x=x, y=y, z=z, w=w)
+
+    @staticmethod
+    def q_from_rz_batch(rz_rad: np.ndarray) -> np.ndarray:
+        """
+        vectorized `q_from_rz`, e.g. to sweep rz: (N,) angles -> (N, 4) quaternions as [x, y, z, w]
+        """
+        return quat_from_rz_batch(rz_rad=rz_rad)
 
     def move_to_init_pose(self) -> bool:
         if 'init_ee_xyz_and_rotvec' not in self.config:
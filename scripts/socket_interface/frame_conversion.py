@@ -5,59 +5,184 @@ convert a pose (position and orientation) between
 the pose is a 6d list, where the orientation is encoded as a rotvec (! NOT EULER / RPY !)
 """
 
+import math
 import numpy as np
 from scipy.spatial.transform import Rotation
+from typing import List, Optional, Sequence, Tuple
 
 d_ee_l8_m = 0.1035
 
-
-def ee_in_base(l8_in_base):
+# constant rotations between `panda_link8` and `panda_EE`, as quaternions [x, y, z, w]
+#   i.e. Rotation.from_euler(angles=[0, 0, -45], seq='xyz', degrees=True).as_quat() and its inverse
+_q_l8_to_ee = (0., 0., -math.sin(math.pi / 8), math.cos(math.pi / 8))
+_q_ee_to_l8 = (0., 0., math.sin(math.pi / 8), math.cos(math.pi / 8))
+
+# the conversions are called on every socket message:
+#   for single 6d poses, plain `math` is much faster than the `scipy` / `numpy` dispatch
+
+
+def quat_from_rotvec(rx: float, ry: float, rz: float) -> Tuple[float, float, float, float]:
+    angle = math.sqrt(rx * rx + ry * ry + rz * rz)
+    if angle < 1e-3:
+        # taylor expansion of sin(angle / 2) / angle
+        scale = 0.5 - angle * angle / 48 + angle ** 4 / 3840
+    else:
+        scale = math.sin(angle / 2) / angle
+    return rx * scale, ry * scale, rz * scale, math.cos(angle / 2)
+
+
+def rotvec_from_quat(x: float, y: float, z: float, w: float) -> Tuple[float, float, float]:
+    # same convention as `scipy`: angle in [0, pi]
+    if w < 0:
+        x, y, z, w = -x, -y, -z, -w
+    angle = 2 * math.atan2(math.sqrt(x * x + y * y + z * z), w)
+    if angle < 1e-3:
+        # taylor expansion of angle / sin(angle / 2)
+        scale = 2 + angle * angle / 12 + 7 * angle ** 4 / 2880
+    else:
+        scale = angle / math.sin(angle / 2)
+    return x * scale, y * scale, z * scale
+
+
+def _quat_multiply(q1: Sequence[float], q2: Sequence[float]) -> Tuple[float, float, float, float]:
+    x1, y1, z1, w1 = q1
+    x2, y2, z2, w2 = q2
+    return (
+        w1 * x2 + x1 * w2 + y1 * z2 - z1 * y2,
+        w1 * y2 - x1 * z2 + y1 * w2 + z1 * x2,
+        w1 * z2 + x1 * y2 - y1 * x2 + z1 * w2,
+        w1 * w2 - x1 * x2 - y1 * y2 - z1 * z2,
+    )
+
+
+def quaternion_angle_rad(q1: Sequence[float], q2: Sequence[float]) -> float:
+    """
+    angle of the rotation between two unit quaternions [x, y, z, w] (q and -q encode the same rotation)
+    """
+    dot = q1[0] * q2[0] + q1[1] * q2[1] + q1[2] * q2[2] + q1[3] * q2[3]
+    return 2 * math.acos(min(1.0, abs(dot)))
+
+
+def euler_xyz_from_quat(x: float, y: float, z: float, w: float) -> Tuple[float, float, float]:
+    """
+    closed-form `Rotation.from_quat([x, y, z, w]).as_euler('xyz')`, the quaternion does not need to be normalized
+    """
+    s = 2.0 / (x * x + y * y + z * z + w * w)
+    r00 = 1.0 - s * (y * y + z * z)
+    r10 = s * (x * y + z * w)
+    r20 = s * (x * z - y * w)
+    r21 = s * (y * z + x * w)
+    r22 = 1.0 - s * (x * x + y * y)
+    return (
+        math.atan2(r21, r22),
+        math.asin(max(-1.0, min(1.0, -r20))),
+        math.atan2(r10, r00),
+    )
+
+
+def quat_from_rz(rz_rad: float) -> Tuple[float, float, float, float]:
+    """
+    quaternion [x, y, z, w] of the orientation [180°, 0, rz] (euler 'xyz')
+    q_z(rz) * q_x(180°) collapses to (cos(rz/2), sin(rz/2), 0, 0)
+    """
+    return math.cos(rz_rad / 2), math.sin(rz_rad / 2), 0.0, 0.0
+
+
+def quat_from_rz_batch(rz_rad: Sequence[float]) -> np.ndarray:
+    """
+    vectorized `quat_from_rz()`, e.g. to sweep rz: (N,) angles -> (N, 4) quaternions as [x, y, z, w]
+    """
+    half_rz_rad = 0.5 * np.asarray(rz_rad, dtype=float).ravel()
+    q = np.zeros((half_rz_rad.size, 4))
+    q[:, 0] = np.cos(half_rz_rad)
+    q[:, 1] = np.sin(half_rz_rad)
+    return q
+
+
+def halton(i: int, base: int) -> float:
+    """
+    i-th element of the van der Corput sequence in base `base`, in [0, 1)
+    using coprime bases for several dimensions gives the (low-discrepancy) Halton sequence
+    """
+    h = 0.0
+    f = 1.0
+    while i > 0:
+        f /= base
+        h += f * (i % base)
+        i //= base
+    return h
+
+
+def trial_offset(i_trial: int, min_offset: float, max_offset: float, base: int) -> float:
+    """
+    offset of a planning parameter for the `i_trial`-th trial: 0 for the first one, in [min_offset, max_offset] after
+    the offsets follow a Halton sequence rather than random draws: a few trials already cover the range evenly
+    """
+    if i_trial == 0:
+        return 0.0
+    # start the sequence at index 2: halton(1, base=2) = 0.5 is the middle of the range, i.e. the first trial
+    return min_offset + halton(i_trial + 1, base=base) * (max_offset - min_offset)
+
+
+def _compose(xyz_and_rotvec: Sequence[float], q: Sequence[float], d_z_m: float) -> List[float]:
+    """
+    pose * (translation of `d_z_m` along z, rotation `q`)
+    """
+    q_pose = quat_from_rotvec(*xyz_and_rotvec[3:6])
+    x, y, z, w = q_pose
+
+    # rot(pose) * [0, 0, d_z_m]: the third column of the rotation matrix, scaled
+    return [
+        xyz_and_rotvec[0] + d_z_m * 2 * (x * z + w * y),
+        xyz_and_rotvec[1] + d_z_m * 2 * (y * z - w * x),
+        xyz_and_rotvec[2] + d_z_m * (1 - 2 * (x * x + y * y)),
+        *rotvec_from_quat(*_quat_multiply(q_pose, q)),
+    ]
+
+
+def ee_in_base(l8_in_base, verbose: bool = True, out: Optional[np.ndarray] = None):
+    """
+    `out`: optional 6d buffer to write the result in, e.g. reused across calls
+    """
     # todo: test
-    ee_in_l8 = np.array([0, 0, d_ee_l8_m])
-    r_l8_to_ee = Rotation.from_euler(angles=[0, 0, -45], seq='xyz', degrees=True)
-
-    print(f'l8_in_base: {[round(e, 2) for e in l8_in_base[:3]]}')
-    base_to_l8_euler_deg = Rotation.from_rotvec(l8_in_base[3:]).as_euler('xyz', degrees=True)
-    print(f'base_to_l8_euler_deg: {[round(e, 2) for e in base_to_l8_euler_deg]}')
+    if verbose:
+        print(f'l8_in_base: {[round(e, 2) for e in l8_in_base[:3]]}')
+        base_to_l8_euler_deg = Rotation.from_rotvec(l8_in_base[3:]).as_euler('xyz', degrees=True)
+        print(f'base_to_l8_euler_deg: {[round(e, 2) for e in base_to_l8_euler_deg]}')
 
-    ee_in_base = np.zeros_like(np.array(l8_in_base))
+    ee_in_base = np.zeros_like(np.array(l8_in_base)) if out is None else out
 
     # rotations: ee_in_base = l8_in_base * ee_in_l8
-    r_b_to_l8 = Rotation.from_rotvec(l8_in_base[3:])
-    r_b_to_ee = r_b_to_l8 * r_l8_to_ee
-    ee_in_base[3:] = r_b_to_ee.as_rotvec()
-
     # translations: b->ee = ee->l8 + rot(b->l8) * 8->ee
-    ee_in_base[:3] = l8_in_base[:3] + r_b_to_l8.as_matrix() @ ee_in_l8
+    ee_in_base[:] = _compose(l8_in_base, q=_q_l8_to_ee, d_z_m=d_ee_l8_m)
 
-    print(f'ee_in_base: {[round(e, 2) for e in ee_in_base[:3]]}')
-    base_to_ee_euler_deg = Rotation.from_rotvec(ee_in_base[3:]).as_euler('xyz', degrees=True)
-    print(f'base_to_ee_euler_deg: {[round(e, 2) for e in base_to_ee_euler_deg]}')
+    if verbose:
+        print(f'ee_in_base: {[round(e, 2) for e in ee_in_base[:3]]}')
+        base_to_ee_euler_deg = Rotation.from_rotvec(ee_in_base[3:]).as_euler('xyz', degrees=True)
+        print(f'base_to_ee_euler_deg: {[round(e, 2) for e in base_to_ee_euler_deg]}')
 
     return ee_in_base
 
 
-def link8_in_base(ee_in_base):
-    l8_in_ee = np.array([0, 0, -d_ee_l8_m])
-    r_ee_to_l8 = Rotation.from_euler(angles=[0, 0, 45], seq='xyz', degrees=True)
+def link8_in_base(ee_in_base, verbose: bool = True, out: Optional[np.ndarray] = None):
+    """
+    `out`: optional 6d buffer to write the result in, e.g. reused across calls
+    """
+    if verbose:
+        print(f'ee_in_base: {[round(e, 2) for e in ee_in_base[:3]]}')
+        base_to_ee_euler_deg = Rotation.from_rotvec(ee_in_base[3:]).as_euler('xyz', degrees=True)
+        print(f'base_to_ee_euler_deg: {[round(e, 2) for e in base_to_ee_euler_deg]}')
 
-    print(f'ee_in_base: {[round(e, 2) for e in ee_in_base[:3]]}')
-    base_to_ee_euler_deg = Rotation.from_rotvec(ee_in_base[3:]).as_euler('xyz', degrees=True)
-    print(f'base_to_ee_euler_deg: {[round(e, 2) for e in base_to_ee_euler_deg]}')
-
-    l8_in_base = np.zeros_like(np.array(ee_in_base))
+    l8_in_base = np.zeros_like(np.array(ee_in_base)) if out is None else out
 
     # rotations: l8_in_base = ee_in_base * l8_in_ee
-    r_b_to_ee = Rotation.from_rotvec(ee_in_base[3:])
-    r_b_to_l8 = r_b_to_ee * r_ee_to_l8
-    l8_in_base[3:] = r_b_to_l8.as_rotvec()
-
     # translations: b->8 = b->ee + rot(b->e) * ee->8
-    l8_in_base[:3] = ee_in_base[:3] + r_b_to_ee.as_matrix() @ l8_in_ee
+    l8_in_base[:] = _compose(ee_in_base, q=_q_ee_to_l8, d_z_m=-d_ee_l8_m)
 
-    print(f'l8_in_base: {[round(e, 2) for e in l8_in_base[:3]]}')
-    base_to_l8_euler_deg = Rotation.from_rotvec(l8_in_base[3:]).as_euler('xyz', degrees=True)
-    print(f'base_to_l8_euler_deg: {[round(e, 2) for e in base_to_l8_euler_deg]}')
+    if verbose:
+        print(f'l8_in_base: {[round(e, 2) for e in l8_in_base[:3]]}')
+        base_to_l8_euler_deg = Rotation.from_rotvec(l8_in_base[3:]).as_euler('xyz', degrees=True)
+        print(f'base_to_l8_euler_deg: {[round(e, 2) for e in base_to_l8_euler_deg]}')
 
     return l8_in_base
 
@@ -2,15 +2,26 @@
 socket client for the panda robot-arm
 """
 import argparse
+import logging
+import numpy as np
 from pathlib import Path
 from scipy.spatial.transform import Rotation
 import socket
+import struct
 import time
 
 from compapy.scripts.MyCoMPaPy import MyCoMPaPy
 from compapy.scripts.utils import setup_logger
 from compapy.scripts.socket_interface.frame_conversion import link8_in_base, ee_in_base
 from compapy.scripts.socket_interface.pose_conversion import pose_from_xyz_and_rotvec, xyz_and_rotvec_from_pose
+from compapy.scripts.socket_interface.protocol import FrameReader, encode_frame, parse_frame, parse_text_message, \
+    OPCODE_EXIT, OPCODE_GRIPPER, OPCODE_MOVE, OPCODE_STATE
+
+
+# '[gripper_gap_mm={}][j_0={}]...[j_5={}][p_0={}]...[p_5={}]'
+_STATE_FMT = '[gripper_gap_mm={}]' + \
+             ''.join(f'[j_{i}={{}}]' for i in range(6)) + \
+             ''.join(f'[p_{i}={{}}]' for i in range(6))
 
 
 def state_to_str(
@@ -18,16 +29,15 @@ def state_to_str(
         joints_rad,
         tcp_pose,
 ) -> str:
-    state_gripper = f'[gripper_gap_mm={gripper_gap_mm}]'
-    state_joints = ''.join([f'[j_{i}={joints_rad[i]}]' for i in range(6)])
-    state_pose = ''.join([f'[p_{i}={tcp_pose[i]}]' for i in range(6)])
-    return state_gripper + state_joints + state_pose
+    return _STATE_FMT.format(gripper_gap_mm, *joints_rad[:6], *tcp_pose[:6])
 
 
 def main(
         teleport: bool = False,
         ignore_gripper: bool = False,
         process_target: bool = True,
+        debug: bool = False,
+        text_protocol: bool = False,
 ):
     saving_dir = Path('logs') / str(time.strftime("%Y%m%d_%H%M%S"))
     saving_dir.mkdir(exist_ok=True, parents=True)
@@ -36,37 +46,66 @@ def main(
         save_planning_res=True
     )
 
-    logger = setup_logger(name=Path(__file__).name, log_file=saving_dir / 'socket.log')
+    logger = setup_logger(
+        name=Path(__file__).name,
+        log_file=saving_dir / 'socket.log',
+        level=logging.DEBUG if debug else logging.INFO
+    )
+    log_debug = logger.isEnabledFor(logging.DEBUG)
 
     host = "127.0.0.1"
     port = 65432
 
     if not compapy.move_to_init_pose():
         logger.error('could not move to init pose')
+        compapy.shutdown()
         return
 
     with socket.socket(socket.AF_INET, socket.SOCK_STREAM) as s:
         s.setblocking(True)  # equivalent to sock.settimeout(None), otherwise "socket.timeout: timed out"
+        s.setsockopt(socket.SOL_SOCKET, socket.SO_RCVBUF, 65536)  # before `connect` to affect the tcp window
         s.connect((host, port))
+        # small request/reply messages: send them right away instead of waiting to coalesce them (Nagle)
+        s.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
         compapy.logger.info(f'socket timeout = {s.gettimeout()}')
 
         gripper_gap_mm_overwritten = 1000 * compapy.config['open_gripper']['width']
+        frame_reader = FrameReader(s)
+
+        # buffers reused for the pose sent back at each message
+        l8_buf = np.empty(6)
+        ee_buf = np.empty(6)
 
         while True:
-            data = s.recv(1024)
-            data = data.decode('utf-8')
-            logger.info(f'received {data!r}')
             success = False
             error_msg = ''
-            if data == '>exit<':
+            data = None
+            try:
+                if text_protocol:
+                    data = s.recv(1024)  # raw bytes are logged if they cannot be decoded
+                    data = data.decode('utf-8')
+                    opcode, args = parse_text_message(data)
+                else:
+                    frame = frame_reader.read()
+                    if frame is None:
+                        logger.info('socket closed by the server - bye')
+                        break
+                    data = frame
+                    opcode, args = parse_frame(*frame)
+                logger.info(f'received opcode=[{opcode}] args={[round(e, 3) for e in args]}')
+            except (ValueError, struct.error) as e:
+                logger.error(f'cannot parse data=[{data}]: exception=[{e}]')
+                opcode, args = None, ()
+
+            if opcode == OPCODE_EXIT:
                 logger.info('closing client socket - bye')
                 break
 
-            elif '>move<' in data:
+            elif opcode == OPCODE_MOVE:
                 try:
-                    target_pose_str = data[len('>move<>'):-len('<')]
-                    target_pose_ee_in_base = [float(x) for x in target_pose_str.split('<>')]
-                    logger.debug(f'target_pose_ee_in_base: {[round(e, 3) for e in target_pose_ee_in_base]}')
+                    target_pose_ee_in_base = list(args)
+                    if log_debug:
+                        logger.debug(f'target_pose_ee_in_base: {[round(e, 3) for e in target_pose_ee_in_base]}')
                     # example:
                     # data='>move<>0.561<>-0.487<>0.348<>2.786<>-0.586<>0.509<'
                     # target_pose_ee_in_base=[0.561, -0.487, 0.348, 2.786, -0.586, 0.509]
@@ -74,7 +113,10 @@ def main(
                     #   IMPORTANT: Rot-Vec, not RPY/Euler!
 
                     target_l8_pose = pose_from_xyz_and_rotvec(
-                        xyz_and_rotvec=link8_in_base(ee_in_base=target_pose_ee_in_base)
+                        xyz_and_rotvec=link8_in_base(
+                            ee_in_base=target_pose_ee_in_base,
+                            verbose=log_debug
+                        )
                     )
 
                     if teleport:
@@ -93,8 +135,8 @@ def main(
                     logger.error(msg)
                     error_msg += f' {msg} '
 
-            elif '>gripper<' in data:
-                if data == '>gripper<>1<':
+            elif opcode == OPCODE_GRIPPER:
+                if args[0] == 1:
                     logger.info('trying to open')
                     try:
                         if ignore_gripper:
@@ -106,7 +148,7 @@ def main(
                         msg = f'[open-gripper] exception=[{e}]'
                         logger.error(msg)
                         error_msg += f' {msg} '
-                elif data == '>gripper<>0<':
+                elif args[0] == 0:
                     logger.info('trying to close')
                     try:
                         if ignore_gripper:
@@ -131,21 +173,23 @@ def main(
             l8_pose = compapy.get_pose()
 
             l8_xyz_and_rotvec = xyz_and_rotvec_from_pose(
-                pose=l8_pose
+                pose=l8_pose,
+                out=l8_buf
             )
-            ee_in_base_out = ee_in_base(l8_xyz_and_rotvec)
+            ee_in_base_out = ee_in_base(l8_xyz_and_rotvec, verbose=log_debug, out=ee_buf)
 
-            logger.debug(f'ee_in_base_out: {[round(e, 2) for e in ee_in_base_out]}')
-            logger.debug(
-                f'r_base_to_ee = '
-                f'{[round(e, 2) for e in Rotation.from_rotvec(ee_in_base_out[3:]).as_euler("xyz", degrees=True)]}'
-                f'(euler-deg)'
-            )
+            if log_debug:
+                logger.debug(f'ee_in_base_out: {[round(e, 2) for e in ee_in_base_out]}')
+                logger.debug(
+                    f'r_base_to_ee = '
+                    f'{[round(e, 2) for e in Rotation.from_rotvec(ee_in_base_out[3:]).as_euler("xyz", degrees=True)]}'
+                    f'(euler-deg)'
+                )
 
             if ignore_gripper:
-                if data == '>gripper<>0<':
+                if (opcode == OPCODE_GRIPPER) and (args[0] == 0):
                     gripper_gap_mm_overwritten = 57.4  # todo: read from config
-                elif data == '>gripper<>1<':
+                elif (opcode == OPCODE_GRIPPER) and (args[0] == 1):
                     gripper_gap_mm_overwritten = 1000 * compapy.config['open_gripper']['width']
                 gripper_gap_mm = gripper_gap_mm_overwritten
 
@@ -168,11 +212,17 @@ def main(
             if not success:
                 state_str = f'error: {state_str}'
 
-            logger.debug(f'state_str = {state_str}')
-            state_bytes = bytes(state_str, 'utf-8')
+            logger.debug('state_str = %s', state_str)
+            state_bytes = state_str.encode()
+            if not text_protocol:
+                state_bytes = encode_frame(OPCODE_STATE, state_bytes)
 
             s.sendall(state_bytes)
-            time.sleep(0.1)
+            if text_protocol:
+                # without framing, the server relies on the delay to separate consecutive messages
+                time.sleep(0.1)
+
+    compapy.shutdown()
 
 
 if __name__ == '__main__':
@@ -184,10 +234,16 @@ if __name__ == '__main__':
     parser.add_argument('--use_target_processing', action='store_true',
                         help='enable the specific processing '
                              'e.g. make sure the gripper stays vertical and wrap its yaw angle to a particular range')
+    parser.add_argument('--debug', action='store_true',
+                        help='log at DEBUG level (slower: conversions are also computed for logging)')
+    parser.add_argument('--text_protocol', action='store_true',
+                        help='use the legacy text messages instead of the binary frames (cf. `protocol.py`)')
     args = parser.parse_args()
 
     main(
         teleport=args.teleport,
         ignore_gripper=args.ignore_gripper,
         process_target=args.use_target_processing,
+        debug=args.debug,
+        text_protocol=args.text_protocol,
     )
@@ -1,8 +1,10 @@
-from scipy.spatial.transform import Rotation
-from typing import List
+from typing import List, Optional, Union
 
+import numpy as np
 from geometry_msgs.msg import Pose
 
+from compapy.scripts.socket_interface.frame_conversion import quat_from_rotvec, rotvec_from_quat
+
 
 def pose_from_xyz_and_rotvec(
         xyz_and_rotvec: List
@@ -13,7 +15,7 @@ def pose_from_xyz_and_rotvec(
     pose.position.y = xyz_and_rotvec[1]
     pose.position.z = xyz_and_rotvec[2]
 
-    q = Rotation.from_rotvec(xyz_and_rotvec[3:6]).as_quat()
+    q = quat_from_rotvec(*xyz_and_rotvec[3:6])
     pose.orientation.x = q[0]
     pose.orientation.y = q[1]
     pose.orientation.z = q[2]
@@ -23,19 +25,22 @@ def pose_from_xyz_and_rotvec(
 
 
 def xyz_and_rotvec_from_pose(
-        pose: Pose
-) -> List:
-    xyz_and_rotvec = [0.0] * 6
+        pose: Pose,
+        out: Optional[Union[List, np.ndarray]] = None
+) -> Union[List, np.ndarray]:
+    """
+    `out`: optional 6d list / array to write the result in, e.g. reused across calls
+    """
+    xyz_and_rotvec = [0.0] * 6 if out is None else out
 
     xyz_and_rotvec[0] = pose.position.x
     xyz_and_rotvec[1] = pose.position.y
     xyz_and_rotvec[2] = pose.position.z
 
-    rot = Rotation.from_quat([
-        pose.orientation.x,
-        pose.orientation.y,
-        pose.orientation.z,
-        pose.orientation.w
-    ])
-    xyz_and_rotvec[3:6] = rot.as_rotvec()
+    xyz_and_rotvec[3:6] = rotvec_from_quat(
+        x=pose.orientation.x,
+        y=pose.orientation.y,
+        z=pose.orientation.z,
+        w=pose.orientation.w
+    )
     return xyz_and_rotvec
@@ -0,0 +1,89 @@
+"""
+messages exchanged with the socket server
+
+binary protocol: each message is a frame `length | opcode | payload`
+- `length`: size of `payload` in bytes, uint32 little-endian
+- `opcode`: uint8, one of the `OPCODE_` constants
+- `payload`:
+    - `OPCODE_EXIT`: empty
+    - `OPCODE_MOVE`: 6 float64 little-endian: x, y, z, rx, ry, rz (pose of the ee in base, orientation as rotvec)
+    - `OPCODE_GRIPPER`: 1 uint8: 1 to open, 0 to close
+    - `OPCODE_STATE` (reply of the client): the utf-8 encoded state string
+
+legacy text protocol, e.g. '>move<>0.561<>-0.487<>0.348<>2.786<>-0.586<>0.509<', '>gripper<>1<' and '>exit<'
+"""
+import socket
+import struct
+from typing import Optional, Tuple
+
+OPCODE_EXIT = 0
+OPCODE_MOVE = 1
+OPCODE_GRIPPER = 2
+OPCODE_STATE = 3
+
+_FRAME_HEADER = struct.Struct('<IB')
+_MOVE_PAYLOAD = struct.Struct('<6d')
+_GRIPPER_PAYLOAD = struct.Struct('<B')
+
+
+def encode_frame(opcode: int, payload: bytes = b'') -> bytes:
+    return _FRAME_HEADER.pack(len(payload), opcode) + payload
+
+
+def parse_frame(opcode: int, payload: bytes) -> Tuple[Optional[int], Tuple]:
+    """
+    returns (opcode, args), with opcode=None if not supported
+    raises `struct.error` if the payload does not match the opcode
+    """
+    if opcode == OPCODE_EXIT:
+        return OPCODE_EXIT, ()
+    if opcode == OPCODE_MOVE:
+        return OPCODE_MOVE, _MOVE_PAYLOAD.unpack(payload)
+    if opcode == OPCODE_GRIPPER:
+        return OPCODE_GRIPPER, _GRIPPER_PAYLOAD.unpack(payload)
+    return None, ()
+
+
+def parse_text_message(data: str) -> Tuple[Optional[int], Tuple]:
+    """
+    same as `parse_frame()` for the legacy text protocol
+    raises `ValueError` if the values cannot be parsed
+    """
+    if data == '>exit<':
+        return OPCODE_EXIT, ()
+    if '>move<' in data:
+        return OPCODE_MOVE, tuple(float(x) for x in data[len('>move<>'):-len('<')].split('<>'))
+    if '>gripper<' in data:
+        return OPCODE_GRIPPER, (int(data[len('>gripper<>'):-len('<')]),)
+    return None, ()
+
+
+class FrameReader:
+    """
+    reads frames from a socket, coping with frames split over several `recv` or several frames in one `recv`
+    """
+
+    def __init__(self, s: socket.socket, buffer_size: int = 4096):
+        self.s = s
+        self._chunk = bytearray(buffer_size)
+        self._chunk_view = memoryview(self._chunk)
+        self._buffer = bytearray()
+
+    def read(self) -> Optional[Tuple[int, bytes]]:
+        """
+        blocks until a complete frame is received and returns (opcode, payload)
+        returns None if the connection is closed
+        """
+        while True:
+            if len(self._buffer) >= _FRAME_HEADER.size:
+                length, opcode = _FRAME_HEADER.unpack_from(self._buffer)
+                frame_end = _FRAME_HEADER.size + length
+                if len(self._buffer) >= frame_end:
+                    payload = bytes(self._buffer[_FRAME_HEADER.size:frame_end])
+                    del self._buffer[:frame_end]
+                    return opcode, payload
+
+            n_bytes = self.s.recv_into(self._chunk)
+            if n_bytes == 0:
+                return None
+            self._buffer += self._chunk_view[:n_bytes]
@@ -7,7 +7,9 @@ import pytest
 from scipy.spatial.transform import Rotation
 
 
-from compapy.scripts.socket_interface.frame_conversion import link8_in_base, ee_in_base
+from compapy.scripts.socket_interface.frame_conversion import link8_in_base, ee_in_base, \
+    quat_from_rotvec, rotvec_from_quat, euler_xyz_from_quat, quat_from_rz, quat_from_rz_batch, quaternion_angle_rad, \
+    halton, trial_offset
 
 
 @pytest.mark.parametrize("ee_in_base, l8_in_base", [
@@ -104,3 +106,91 @@ def test_ee_in_base(l8_in_base, ee_in_base_expected):
                 f'ee_in_base_res: [{ee_in_base_res.tolist()}]'
                 f''
     )
+
+
+@pytest.mark.parametrize("rotvec", [
+    [0., 0., 0.],
+    [1e-6, -2e-6, 0.],
+    [np.pi, 0., 0.],
+    [0.3, -1.2, 2.5],
+    [-2.786, 0.586, -0.509],
+])
+def test_rotvec_quat_round_trip(rotvec):
+    q = quat_from_rotvec(*rotvec)
+    np.testing.assert_allclose(Rotation.from_quat(q).as_rotvec(), rotvec, atol=1e-9)
+    np.testing.assert_allclose(rotvec_from_quat(*q), Rotation.from_quat(q).as_rotvec(), atol=1e-9)
+
+
+def test_quaternion_angle_rad():
+    rng = np.random.default_rng(0)
+    for _ in range(1000):
+        r1, r2 = Rotation.random(2, random_state=rng)
+        q1, q2 = r1.as_quat(), r2.as_quat()
+        expected = (r1.inv() * r2).magnitude()
+        assert quaternion_angle_rad(q1, q2) == pytest.approx(expected, abs=1e-6)
+        # q and -q encode the same rotation
+        assert quaternion_angle_rad(q1, -q2) == pytest.approx(expected, abs=1e-6)
+    q = Rotation.random(random_state=rng).as_quat()
+    assert quaternion_angle_rad(q, q) == pytest.approx(0., abs=1e-6)
+    assert quaternion_angle_rad(q, -q) == pytest.approx(0., abs=1e-6)
+
+
+def test_euler_xyz_from_quat():
+    rng = np.random.default_rng(0)
+    for _ in range(1000):
+        euler_rad = rng.uniform(-1, 1, 3) * [np.pi, np.pi / 2 - 0.01, np.pi]
+        # neither normalized nor with a positive w
+        q = Rotation.from_euler(angles=euler_rad, seq='xyz').as_quat() * rng.uniform(-2, 2)
+        np.testing.assert_allclose(
+            euler_xyz_from_quat(*q),
+            Rotation.from_quat(q).as_euler('xyz'),
+            atol=1e-9,
+            err_msg=f'q = {q.tolist()}'
+        )
+
+
+@pytest.mark.parametrize("rz_rad", [0., np.pi / 4, -np.pi / 4, np.pi / 2, -3., np.pi])
+def test_quat_from_rz(rz_rad):
+    q = np.array(quat_from_rz(rz_rad))
+    q_expected = Rotation.from_euler(angles=[np.pi, 0., rz_rad], seq='xyz').as_quat()
+    # q and -q encode the same rotation
+    assert min(np.abs(q - q_expected).max(), np.abs(q + q_expected).max()) < 1e-9
+    assert euler_xyz_from_quat(*q)[2] == pytest.approx(rz_rad if abs(rz_rad) < np.pi else np.pi, abs=1e-9)
+
+
+def test_quat_from_rz_batch():
+    rz_rad = np.linspace(-np.pi, np.pi, 37)
+    q = quat_from_rz_batch(rz_rad)
+    assert q.shape == (37, 4)
+    np.testing.assert_allclose(q, [quat_from_rz(rz) for rz in rz_rad], atol=1e-12)
+    np.testing.assert_allclose(
+        Rotation.from_quat(q).as_matrix(),
+        Rotation.from_euler(angles=np.column_stack([np.full_like(rz_rad, np.pi), np.zeros_like(rz_rad), rz_rad]),
+                            seq='xyz').as_matrix(),
+        atol=1e-9
+    )
+
+
+def test_halton():
+    assert [halton(i, base=2) for i in range(5)] == [0., 0.5, 0.25, 0.75, 0.125]
+    assert halton(1, base=3) == pytest.approx(1 / 3)
+    assert halton(5, base=3) == pytest.approx(2 / 3 + 1 / 9)
+
+
+@pytest.mark.parametrize("min_offset, max_offset, base", [
+    (-0.005, 0.005, 2),
+    (-2.0, 2.0, 3),
+    (0.0, 1.0, 2),
+])
+def test_trial_offset(min_offset, max_offset, base):
+    n_trials = 10
+    offsets = [trial_offset(i_trial, min_offset=min_offset, max_offset=max_offset, base=base)
+               for i_trial in range(n_trials)]
+    # the first trial uses the config values, the next ones start the sequence at index 2
+    assert offsets[0] == 0.
+    assert offsets[1] == pytest.approx(min_offset + halton(2, base=base) * (max_offset - min_offset))
+    assert all(min_offset <= o <= max_offset for o in offsets)
+    # with a symmetric range, no trial repeats the first one (offset 0, the middle of the range)
+    if min_offset == -max_offset:
+        assert all(abs(o) > 1e-9 for o in offsets[1:])
+    assert len(set(offsets)) == n_trials
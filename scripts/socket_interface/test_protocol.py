@@ -0,0 +1,49 @@
+"""
+~/catkin_ws/src/compapy$ py.test scripts/socket_interface/test_protocol.py
+"""
+
+import socket
+import struct
+
+import pytest
+
+from compapy.scripts.socket_interface.protocol import FrameReader, encode_frame, parse_frame, parse_text_message, \
+    OPCODE_EXIT, OPCODE_GRIPPER, OPCODE_MOVE
+
+
+@pytest.mark.parametrize("data, expected", [
+    ('>exit<', (OPCODE_EXIT, ())),
+    ('>move<>0.561<>-0.487<>0.348<>2.786<>-0.586<>0.509<', (OPCODE_MOVE, (0.561, -0.487, 0.348, 2.786, -0.586, 0.509))),
+    ('>gripper<>1<', (OPCODE_GRIPPER, (1,))),
+    ('>gripper<>0<', (OPCODE_GRIPPER, (0,))),
+    ('>jump<', (None, ())),
+])
+def test_parse_text_message(data, expected):
+    assert parse_text_message(data) == expected
+
+
+@pytest.mark.parametrize("opcode, payload, expected", [
+    (OPCODE_EXIT, b'', (OPCODE_EXIT, ())),
+    (OPCODE_MOVE, struct.pack('<6d', 0.5, -0.5, 0.25, 3.0, 0., -1.), (OPCODE_MOVE, (0.5, -0.5, 0.25, 3.0, 0., -1.))),
+    (OPCODE_GRIPPER, b'\x01', (OPCODE_GRIPPER, (1,))),
+    (42, b'', (None, ())),
+])
+def test_parse_frame(opcode, payload, expected):
+    assert parse_frame(opcode, payload) == expected
+
+
+def test_frame_reader():
+    move_payload = struct.pack('<6d', *range(6))
+    stream = encode_frame(OPCODE_GRIPPER, b'\x00') + encode_frame(OPCODE_MOVE, move_payload) + encode_frame(OPCODE_EXIT)
+
+    server, client = socket.socketpair()
+    with server, client:
+        reader = FrameReader(client, buffer_size=5)  # frames split over several recv
+        server.sendall(stream[:3])
+        server.sendall(stream[3:])
+        server.close()
+
+        assert reader.read() == (OPCODE_GRIPPER, b'\x00')
+        assert reader.read() == (OPCODE_MOVE, move_payload)
+        assert reader.read() == (OPCODE_EXIT, b'')
+        assert reader.read() is None
@@ -27,6 +27,7 @@ class TestRefActions(unittest.TestCase):
         self.compapy.config['close_gripper']['width'] = 0.0
         self.compapy.config['close_gripper']['epsilon_inner'] = 0.001
         self.compapy.config['close_gripper']['epsilon_outer'] = 0.001
+        self.compapy._unpack_config()
         for _ in range(n_repetition):
             for name in ['open_gripper', 'close_gripper']:
                 success = self.compapy.close_gripper() if name == 'close_gripper' else self.compapy.open_gripper()